@@ -9,16 +9,96 @@ Coded by Ameer Xoshnaw
 import sys
 import os
 import gzip
-from io import BytesIO
+import shutil
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 
 
-def extract_font(fnt_file, output_file=None):
+# Buffer sizes used when streaming gzip data to and from disk
+RAW_CHUNK_SIZE = 64 * 1024
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# zlib window bits for a gzip wrapped stream
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+# Magic at the start of the DDS image
+DDS_MAGIC = b'DDS '
+
+# How much of the decompressed stream to read first when looking for
+# the DDS marker (the FRM/TEX header is only 14 bytes in the shipped fonts)
+HEADER_SCAN_SIZE = 512
+
+# Default FRM/TEX header: FRM\x02\x00\x00\x00TEX\x80\x00\x01\x00
+DEFAULT_FRM_TEX_HEADER = bytes.fromhex('46524d0200000054455880000100')
+
+# Extension of the sidecar file caching an original .fnt's FRM/TEX header
+HEADER_CACHE_EXT = '.frmtex'
+
+# Sidecar layout: original size, original mtime in ns, header length, header
+HEADER_CACHE_STRUCT = struct.Struct('<QqI')
+
+# DDS texture data barely compresses, so level 9 only costs time
+# for a few bytes saved; a fast level keeps repacking quick
+GZIP_COMPRESS_LEVEL = 1
+
+
+def _iter_gzip_blocks(raw, scratch=None):
+    """
+    Decompress a gzip stream from an open binary file
+    Yields decompressed blocks of at most COPY_CHUNK_SIZE bytes
+    Compressed input is read into scratch (a bytearray) when given
+    Concatenated gzip members are all decoded, like gzip.open() does
+    """
+    if scratch is None:
+        scratch = bytearray(RAW_CHUNK_SIZE)
+    view = memoryview(scratch)
+    decomp = zlib.decompressobj(GZIP_WBITS)
+    pending = b''
+    while True:
+        if decomp.eof:
+            # Another member may follow, skip any zero padding before it
+            pending = decomp.unused_data.lstrip(b'\x00')
+            while not pending:
+                size = raw.readinto(scratch)
+                if not size:
+                    return
+                pending = bytes(view[:size]).lstrip(b'\x00')
+            decomp = zlib.decompressobj(GZIP_WBITS)
+        elif not pending:
+            size = raw.readinto(scratch)
+            if not size:
+                raise EOFError("Compressed file ended before the end-of-stream marker was reached")
+            pending = view[:size]
+        block = decomp.decompress(pending, COPY_CHUNK_SIZE)
+        pending = decomp.unconsumed_tail
+        if block:
+            yield block
+
+
+def _write_dds(out, first, blocks):
+    """
+    Write the first partial block and the remaining blocks to out
+    Returns the number of bytes written
+    """
+    out.write(first)
+    size = len(first)
+    for block in blocks:
+        out.write(block)
+        size += len(block)
+    return size
+
+
+def extract_font(fnt_file, output_file=None, scratch=None):
     """
     Extract the font file from .fnt archive and save it
     Removes FRM/TEX header and saves only DDS image data
+    Pass '-' as output_file to write the DDS to stdout, messages then go to stderr
     """
+    log = sys.stderr if output_file == '-' else sys.stdout
+    
     if not os.path.exists(fnt_file):
-        print(f"Error: {fnt_file} not found!")
+        print(f"Error: {fnt_file} not found!", file=log)
         return False
     
     # Determine output filename if not provided
@@ -27,38 +107,174 @@ def extract_font(fnt_file, output_file=None):
         output_file = f"{base_name}.dds"
     
     try:
-        print(f"Extracting from {fnt_file}...")
-        
-        with gzip.open(fnt_file, 'rb') as gz:
-            data = gz.read()
-        
-        # Find DDS marker position
-        dds_pos = data.find(b'DDS ')
-        if dds_pos == -1:
-            print("Error: DDS marker not found in file!")
-            return False
-        
-        # Save the FRM/TEX header for later repacking
-        frm_tex_header = data[:dds_pos]
-        print(f"Found FRM/TEX header ({len(frm_tex_header)} bytes), removing before DDS...")
+        print(f"Extracting from {fnt_file}...", file=log)
         
-        # Extract only DDS data (remove FRM/TEX header)
-        dds_data = data[dds_pos:]
-        
-        with open(output_file, 'wb') as out:
-            out.write(dds_data)
+        with open(fnt_file, 'rb') as raw:
+            blocks = _iter_gzip_blocks(raw, scratch)
+            
+            # Find DDS marker position. FRM/TEX header is tiny, so the marker
+            # is normally near the start of the first block and find() stops
+            # there; keep reading only for an unusually long header
+            head = bytearray()
+            dds_pos = -1
+            for block in blocks:
+                # Overlap the search so a marker split across blocks is found
+                start = max(len(head) - len(DDS_MAGIC) + 1, 0)
+                head += block
+                dds_pos = head.find(DDS_MAGIC, start)
+                if dds_pos != -1:
+                    break
+            if dds_pos == -1:
+                print("Error: DDS marker not found in file!", file=log)
+                return False
+            
+            # The FRM/TEX header is everything in front of the marker
+            print(f"Found FRM/TEX header ({dds_pos} bytes), removing before DDS...", file=log)
+            
+            # Write through a view so the first block isn't copied again
+            first = memoryview(head)[dds_pos:]
+            
+            # Stream straight into a pipe
+            if output_file == '-':
+                out = sys.stdout.buffer
+                _write_dds(out, first, blocks)
+                out.flush()
+                print("Successfully extracted to stdout", file=log)
+                return True
+            
+            # Extract only DDS data (remove FRM/TEX header), streaming the rest
+            # into a temporary file so a failed extract leaves no partial .dds
+            tmp_file = f"{output_file}.tmp"
+            try:
+                with open(tmp_file, 'wb') as out:
+                    dds_size = _write_dds(out, first, blocks)
+                os.replace(tmp_file, output_file)
+            except BaseException:
+                if os.path.exists(tmp_file):
+                    os.remove(tmp_file)
+                raise
         
-        file_size = len(dds_data)
-        print(f"Successfully extracted to {output_file} ({file_size:,} bytes, DDS image only)")
+        print(f"Successfully extracted to {output_file} ({dds_size:,} bytes, DDS image only)", file=log)
         return True
         
     except Exception as e:
-        print(f"Error extracting {fnt_file}: {e}")
+        print(f"Error extracting {fnt_file}: {e}", file=log)
         import traceback
         traceback.print_exc()
         return False
 
 
+def extract_font_many(fnt_files):
+    """
+    Extract several .fnt files one after another
+    Shares one read buffer between files instead of allocating per file
+    Returns True only if every file was extracted
+    """
+    scratch = bytearray(RAW_CHUNK_SIZE)
+    success = True
+    for fnt_file in fnt_files:
+        if not extract_font(fnt_file, scratch=scratch):
+            success = False
+    return success
+
+
+def extract_font_batch(directory="."):
+    """
+    Extract every .fnt file in a directory in parallel
+    zlib releases the GIL while decompressing, so threads are enough
+    Returns True only if every file was extracted
+    """
+    # Match the extension case-insensitively, fonts copied from a Windows
+    # install may be named FONTOBJ.FNT
+    try:
+        names = os.listdir(directory)
+    except OSError as e:
+        print(f"Error: Cannot read {directory}: {e}")
+        return False
+    fnt_files = sorted(os.path.join(directory, name) for name in names
+                       if name.lower().endswith('.fnt')
+                       and os.path.isfile(os.path.join(directory, name)))
+    if not fnt_files:
+        print(f"Error: No .fnt files found in {directory}")
+        return False
+    
+    # Output is write-bound, so more than a few workers doesn't help
+    workers = min(os.cpu_count() or 1, 4, len(fnt_files))
+    print(f"Extracting {len(fnt_files)} files with {workers} workers...")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(extract_font, fnt_files))
+    
+    print(f"Extracted {sum(results)} of {len(fnt_files)} files")
+    return all(results)
+
+
+def _load_header_cache(original_fnt_file, stat):
+    """
+    Read the cached FRM/TEX header for an original .fnt file
+    Returns None unless the cache was made from a file with exactly this size and mtime
+    """
+    try:
+        with open(original_fnt_file + HEADER_CACHE_EXT, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    
+    if len(data) < HEADER_CACHE_STRUCT.size:
+        return None
+    size, mtime_ns, length = HEADER_CACHE_STRUCT.unpack_from(data)
+    frm_tex_header = data[HEADER_CACHE_STRUCT.size:]
+    if (size, mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+        return None
+    # A real header has the stored length and ends before the first DDS marker
+    if len(frm_tex_header) != length or DDS_MAGIC in frm_tex_header:
+        return None
+    return frm_tex_header
+
+
+def _save_header_cache(original_fnt_file, frm_tex_header, stat):
+    """
+    Write the FRM/TEX header of an original .fnt file to its sidecar cache
+    """
+    try:
+        with open(original_fnt_file + HEADER_CACHE_EXT, 'wb') as f:
+            f.write(HEADER_CACHE_STRUCT.pack(stat.st_size, stat.st_mtime_ns, len(frm_tex_header)))
+            f.write(frm_tex_header)
+    except OSError:
+        # The cache is only a speedup, e.g. the game folder may be read-only
+        pass
+
+
+def _read_original_header(original_fnt_file):
+    """
+    Get the FRM/TEX header from an original .fnt file
+    The header is cached next to the original so later repacks skip gzip
+    """
+    # Stat before reading so a change during the read invalidates the cache
+    stat = os.stat(original_fnt_file)
+    frm_tex_header = _load_header_cache(original_fnt_file, stat)
+    if frm_tex_header is not None:
+        return frm_tex_header
+    
+    # Only the header in front of the DDS marker is needed
+    with gzip.open(original_fnt_file, 'rb') as gz:
+        head = bytearray()
+        dds_pos = -1
+        read_size = HEADER_SCAN_SIZE
+        while dds_pos == -1:
+            chunk = gz.read(read_size)
+            if not chunk:
+                raise ValueError("DDS marker not found in original")
+            # Unusually long header, keep going in bigger steps
+            read_size = COPY_CHUNK_SIZE
+            start = max(len(head) - len(DDS_MAGIC) + 1, 0)
+            head += chunk
+            dds_pos = head.find(DDS_MAGIC, start)
+    frm_tex_header = bytes(head[:dds_pos])
+    
+    _save_header_cache(original_fnt_file, frm_tex_header, stat)
+    return frm_tex_header
+
+
 def repack_font(input_file, output_file=None, original_fnt_file=None):
     """
     Repack font file back into .fnt format (gzip)
@@ -80,42 +296,38 @@ def repack_font(input_file, output_file=None, original_fnt_file=None):
     try:
         print(f"Repacking {input_file} into {output_file}...")
         
-        # Read the DDS file
-        with open(input_file, 'rb') as f:
-            dds_data = f.read()
-        
         # Verify it starts with DDS
-        if not dds_data.startswith(b'DDS '):
+        with open(input_file, 'rb') as f:
+            dds_magic = f.read(len(DDS_MAGIC))
+        if dds_magic != DDS_MAGIC:
             print("Warning: Input file doesn't start with 'DDS ' marker")
         
         # Get FRM/TEX header from original file if provided, otherwise use default
         if original_fnt_file and os.path.exists(original_fnt_file):
             try:
-                with gzip.open(original_fnt_file, 'rb') as gz:
-                    orig_data = gz.read()
-                    dds_pos = orig_data.find(b'DDS ')
-                    if dds_pos != -1:
-                        frm_tex_header = orig_data[:dds_pos]
-                        print(f"Using FRM/TEX header from original file ({len(frm_tex_header)} bytes)")
-                    else:
-                        raise ValueError("DDS marker not found in original")
+                frm_tex_header = _read_original_header(original_fnt_file)
+                print(f"Using FRM/TEX header from original file ({len(frm_tex_header)} bytes)")
             except:
                 # Fallback to default header
-                frm_tex_header = bytes.fromhex('46524d0200000054455880000100')
+                frm_tex_header = DEFAULT_FRM_TEX_HEADER
                 print("Using default FRM/TEX header")
         else:
-            # Default FRM/TEX header: FRM\x02\x00\x00\x00TEX\x80\x00\x01\x00
-            frm_tex_header = bytes.fromhex('46524d0200000054455880000100')
+            frm_tex_header = DEFAULT_FRM_TEX_HEADER
             print(f"Using default FRM/TEX header ({len(frm_tex_header)} bytes)")
         
-        # Combine header + DDS data
-        full_data = frm_tex_header + dds_data
+        # Create gzip archive, streaming the DDS data in after the header
+        with gzip.open(output_file, 'wb', compresslevel=GZIP_COMPRESS_LEVEL) as gz:
+            gz.write(frm_tex_header)
+            with open(input_file, 'rb') as f:
+                shutil.copyfileobj(f, gz, length=COPY_CHUNK_SIZE)
         
-        # Create gzip archive
-        with gzip.open(output_file, 'wb') as gz:
-            gz.write(full_data)
+        # Repacking over the original changes its size and mtime, so
+        # refresh the cache to keep it valid for the next run
+        if (original_fnt_file and os.path.exists(original_fnt_file)
+                and os.path.samefile(output_file, original_fnt_file)):
+            _save_header_cache(original_fnt_file, frm_tex_header, os.stat(original_fnt_file))
         
-        file_size = len(full_data)
+        file_size = len(frm_tex_header) + os.path.getsize(input_file)
         print(f"Successfully created {output_file} ({file_size:,} bytes compressed)")
         return True
         
@@ -126,38 +338,49 @@ def repack_font(input_file, output_file=None, original_fnt_file=None):
         return False
 
 
+def _print_banner(file=None):
+    """
+    Display the tool banner (on stdout unless another file is given)
+    """
+    print("=" * 50, file=file)
+    print("  Font Tool - Extract & Repack .fnt files", file=file)
+    print("  Coded by Ameer Xoshnaw", file=file)
+    print("=" * 50, file=file)
+    print(file=file)
+
+
 def main():
-    # Display banner
-    print("=" * 50)
-    print("  Font Tool - Extract & Repack .fnt files")
-    print("  Coded by Ameer Xoshnaw")
-    print("=" * 50)
-    print()
-    
     if len(sys.argv) < 2:
+        _print_banner()
         print("Usage:")
-        print("  py \"FontTool Tony Tough 2.py\" extract <font_file.fnt> [output_file]")
+        print("  py \"FontTool Tony Tough 2.py\" extract <font_file.fnt> [output_file | -]")
         print("  py \"FontTool Tony Tough 2.py\" repack <input_file> [output_file.fnt] [original_fnt_file.fnt]")
+        print("  py \"FontTool Tony Tough 2.py\" batch [directory]")
         print("\nExamples:")
         print("  py \"FontTool Tony Tough 2.py\" extract FontObj.fnt")
         print("  py \"FontTool Tony Tough 2.py\" extract FontObj.fnt FontObj.dds")
+        print("  py \"FontTool Tony Tough 2.py\" extract FontObj.fnt - > FontObj.dds")
         print("  py \"FontTool Tony Tough 2.py\" repack FontObj.dds")
         print("  py \"FontTool Tony Tough 2.py\" repack FontObj.dds FontObj.fnt")
         print("  py \"FontTool Tony Tough 2.py\" repack FontObj.dds FontObj.fnt FontObj.fnt")
+        print("  py \"FontTool Tony Tough 2.py\" batch")
         sys.exit(1)
     
     command = sys.argv[1].lower()
     
     if command == "extract":
+        output_file = sys.argv[3] if len(sys.argv) > 3 else None
+        # With '-' the DDS itself goes to stdout, so keep the banner out of it
+        _print_banner(sys.stderr if output_file == '-' else None)
         if len(sys.argv) < 3:
             print("Error: Please specify the .fnt file to extract")
             sys.exit(1)
         fnt_file = sys.argv[2]
-        output_file = sys.argv[3] if len(sys.argv) > 3 else None
         success = extract_font(fnt_file, output_file)
         sys.exit(0 if success else 1)
     
     elif command == "repack":
+        _print_banner()
         if len(sys.argv) < 3:
             print("Error: Please specify the file to repack")
             sys.exit(1)
@@ -167,9 +390,16 @@ def main():
         success = repack_font(input_file, output_file, original_fnt_file)
         sys.exit(0 if success else 1)
     
+    elif command == "batch":
+        _print_banner()
+        directory = sys.argv[2] if len(sys.argv) > 2 else "."
+        success = extract_font_batch(directory)
+        sys.exit(0 if success else 1)
+    
     else:
+        _print_banner()
         print(f"Error: Unknown command '{command}'")
-        print("Use 'extract' or 'repack'")
+        print("Use 'extract', 'repack' or 'batch'")
         sys.exit(1)
 
 
@@ -9,11 +9,67 @@ Coded by Ameer Xoshnaw
 import sys
 import os
 import gzip
+import shutil
 import tarfile
-from io import BytesIO
 from pathlib import Path
 
 
+# Chunk size used when streaming archive members to disk
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# Size of a tar header block
+TAR_BLOCK_SIZE = 512
+
+# Write buffer for the streaming tar writer
+TAR_WRITE_BUFSIZE = 64 * 1024
+
+
+def _read_tar_header(block):
+    """
+    Parse a tar header block for a regular file
+    Returns (name, size), or None if the block isn't a plain ustar file header
+    """
+    if len(block) < TAR_BLOCK_SIZE or block[257:262] != b'ustar':
+        return None
+    # Regular files only; long names and pax headers go through tarfile
+    if block[156:157] not in (b'0', b'\x00'):
+        return None
+    try:
+        checksum = int(block[148:156].split(b'\x00')[0].strip() or b'0', 8)
+        size = int(block[124:136].split(b'\x00')[0].strip() or b'0', 8)
+    except ValueError:
+        return None
+    if checksum != sum(block[:148]) + 8 * 32 + sum(block[156:TAR_BLOCK_SIZE]):
+        return None
+    name = block[:100].split(b'\x00')[0].decode('utf-8', 'replace')
+    return name, size
+
+
+def _extract_first_tar_member(raw, output_file):
+    """
+    Copy out the first member of a tar.gz without going through tarfile
+    Only used when that member is the 'translation' file
+    Returns the member name, or None if the archive needs the full tarfile path
+    """
+    with gzip.GzipFile(fileobj=raw, mode='rb') as gz:
+        header = _read_tar_header(gz.read(TAR_BLOCK_SIZE))
+        if header is None:
+            return None
+        name, size = header
+        if os.path.basename(name).lower() != 'translation':
+            return None
+        
+        with open(output_file, 'wb') as out:
+            remaining = size
+            while remaining:
+                chunk = gz.read(min(remaining, COPY_CHUNK_SIZE))
+                if not chunk:
+                    raise EOFError(f"Archive ended inside '{name}'")
+                out.write(chunk)
+                remaining -= len(chunk)
+        return name
+
+
 def extract_translation(dat_file="translation.dat", output_file="translation.txt"):
     """
     Extract the 'translation' file from translation.dat and save as translation.txt
@@ -23,49 +79,65 @@ def extract_translation(dat_file="translation.dat", output_file="translation.txt
         print(f"Error: {dat_file} not found!")
         return False
     
+    # Everything is written to a temporary file first, so a damaged archive
+    # can't replace an existing translation.txt with a partial one
+    tmp_file = f"{output_file}.tmp"
+    
     try:
         print(f"Extracting from {dat_file}...")
         
-        # Check file signature to determine format
+        # Check file signature to determine format, then keep using
+        # the same handle for every attempt below
         with open(dat_file, 'rb') as f:
-            magic = f.read(2)
+            magic = f.read(3)
             f.seek(0)
             
             # Try tar.gz first (most common for archives with filenames)
-            if magic == b'\x1f\x8b':  # gzip signature
+            if magic == b'\x1f\x8b\x08':  # gzip signature, deflate method
+                # Usually the archive holds just the translation file,
+                # which can be copied straight out of the gzip stream
+                name = _extract_first_tar_member(f, tmp_file)
+                if name is not None:
+                    os.replace(tmp_file, output_file)
+                    print(f"Found translation file: {name}")
+                    print(f"Successfully extracted to {output_file}")
+                    return True
+                
+                f.seek(0)
                 try:
-                    with tarfile.open(dat_file, 'r:gz') as tar:
-                        files = tar.getnames()
-                        print(f"Files in archive: {files}")
-                        
-                        # Look for 'translation' file (case-insensitive)
-                        translation_file = None
-                        for f in files:
-                            if f.lower() == 'translation' or os.path.basename(f).lower() == 'translation':
-                                translation_file = f
+                    # Stream through the members once instead of indexing the archive
+                    with tarfile.open(fileobj=f, mode='r|gz') as tar:
+                        files = []
+                        member = None
+                        for entry in tar:
+                            files.append(entry.name)
+                            if os.path.basename(entry.name).lower() == 'translation':
+                                member = entry
                                 break
                         
-                        if not translation_file:
+                        if member is None:
                             print(f"Error: 'translation' file not found in archive!")
                             print(f"Available files: {files}")
                             return False
                         
-                        print(f"Found translation file: {translation_file}")
+                        print(f"Found translation file: {member.name}")
                         
                         # Extract the file
-                        member = tar.getmember(translation_file)
-                        with tar.extractfile(member) as f:
-                            with open(output_file, 'wb') as out:
-                                out.write(f.read())
+                        with tar.extractfile(member) as src:
+                            with open(tmp_file, 'wb') as out:
+                                shutil.copyfileobj(src, out, length=COPY_CHUNK_SIZE)
+                        os.replace(tmp_file, output_file)
                         
                         print(f"Successfully extracted to {output_file}")
                         return True
                 except tarfile.TarError:
                     # Not a tar.gz, try plain gzip
                     print("Not a tar.gz, trying plain gzip...")
-                    with gzip.open(dat_file, 'rb') as gz:
-                        with open(output_file, 'wb') as out:
-                            out.write(gz.read())
+                    f.seek(0)
+                    with gzip.GzipFile(fileobj=f, mode='rb') as gz:
+                        with open(tmp_file, 'wb') as out:
+                            shutil.copyfileobj(gz, out, length=COPY_CHUNK_SIZE)
+                        os.replace(tmp_file, output_file)
                         print(f"Successfully extracted to {output_file}")
                         return True
             else:
@@ -77,6 +149,11 @@ def extract_translation(dat_file="translation.dat", output_file="translation.txt
         import traceback
         traceback.print_exc()
         return False
+    
+    finally:
+        # Only left behind if the extract didn't finish
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
 
 
 def repack_translation(txt_file="translation.txt", output_file="translation.dat"):
@@ -90,19 +167,21 @@ def repack_translation(txt_file="translation.txt", output_file="translation.dat"
     try:
         print(f"Repacking {txt_file} into {output_file}...")
         
-        # Read the translation file
-        with open(txt_file, 'rb') as f:
-            translation_data = f.read()
-        
         # Create tar.gz archive with the file named 'translation' (no extension)
-        with tarfile.open(output_file, 'w:gz') as tar:
-            # Create a TarInfo object for the file
-            info = tarfile.TarInfo(name='translation')
-            info.size = len(translation_data)
-            info.mtime = os.path.getmtime(txt_file)
-            
-            # Add the file to the archive using BytesIO
-            tar.addfile(info, fileobj=BytesIO(translation_data))
+        # The size is known up front, so the tar can be written as a stream
+        # Text compresses well, so this keeps gzip's default (best) level
+        with gzip.GzipFile(output_file, 'wb') as gz:
+            with tarfile.open(fileobj=gz, mode='w|', bufsize=TAR_WRITE_BUFSIZE) as tar:
+                # Create a TarInfo object for the file
+                info = tarfile.TarInfo(name='translation')
+                info.size = os.path.getsize(txt_file)
+                # Whole seconds: a float mtime makes tarfile add a pax header,
+                # which the fast extract path then has to hand off to tarfile
+                info.mtime = int(os.path.getmtime(txt_file))
+                
+                # Stream the translation file into the archive
+                with open(txt_file, 'rb') as f:
+                    tar.addfile(info, fileobj=f)
         
         print(f"Successfully created {output_file}")
         return True